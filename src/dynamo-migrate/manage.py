@@ -6,6 +6,7 @@ the migrations for the DynamoDB database.
 The script supports the following commands:
     - upgrade: Upgrade the migration to the given version.
         version: The version to upgrade to.
+        --parallel: Run independent migrations concurrently.
     - downgrade: Downgrade the migration by the given number of steps.
         number_of_steps: The number of steps to downgrade.
     - revision: Create a new revision migration file.
@@ -13,14 +14,21 @@ The script supports the following commands:
 """
 from __future__ import annotations
 
-import argparse
+import collections
+import concurrent.futures
+import functools
+import importlib.util
 import os
+import re
+import sys
+import types
 import typing
 
-import boto3
-
 if typing.TYPE_CHECKING:
+    import argparse
+
     from mypy_boto3_dynamodb import DynamoDBServiceResource
+    from mypy_boto3_dynamodb.service_resource import Table
 
 
 # Constants
@@ -28,6 +36,11 @@ VERSION_TABLE = 'DynamoDBMigrationVersion'
 VERSIONS_MODULE = 'migrations.versions'
 VERSIONS_DIR = './migrations/versions'
 VERSION_TEMPLATE = './migrations/version_template.txt'
+MAX_PARALLEL_MIGRATIONS = 8
+
+# Resolved once so filesystem calls do not go through the relative path each time
+_VERSIONS_DIR_ABS = os.path.abspath(VERSIONS_DIR)
+_VERSION_TEMPLATE_ABS = os.path.abspath(VERSION_TEMPLATE)
 
 # AWS DynamoDB
 ENDPOINT_URL = "<Define the NoSQL database URL>"
@@ -35,34 +48,83 @@ REGION_NAME = "<Define the AWS region>"
 AWS_ACCESS_KEY_ID = "<Define the AWS access key ID>"
 AWS_SECRET_ACCESS_KEY = "<Define the AWS secret access key>"
 
-# DynamoDB
-ddb: DynamoDBServiceResource = boto3.resource('dynamodb',
-    endpoint_url=ENDPOINT_URL,
-    region_name=REGION_NAME,
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-)
+# Caches
+_DB_VERSION_CACHE: typing.Dict[str, typing.Optional[int]] = {'version': None}
+_MIGRATION_FILENAMES_CACHE: typing.Dict[str, typing.Any] = {'mtime': None, 'filenames': None}
+_VERSION_TABLE_CACHE: typing.Dict[str, bool] = {'exists': False}
+
+
+@functools.lru_cache(maxsize=1)
+def _ddb() -> DynamoDBServiceResource:
+    """Get the DynamoDB service resource, creating it on first use.
+
+    boto3 is imported here so commands that never touch DynamoDB, such as
+    `revision`, do not pay for loading it.
+
+    Returns:
+        DynamoDBServiceResource: The DynamoDB service resource.
+    """
+    import boto3
+    from botocore.config import Config
+
+    config = Config(
+        max_pool_connections=50,
+        retries={'mode': 'adaptive', 'max_attempts': 10},
+        tcp_keepalive=True,
+        connect_timeout=3,
+        read_timeout=10,
+    )
+
+    return boto3.resource('dynamodb',
+        endpoint_url=ENDPOINT_URL,
+        region_name=REGION_NAME,
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        config=config,
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _version_table() -> Table:
+    """Get the table storing the migration version.
+
+    Returns:
+        Table: The migration version table.
+    """
+    return _ddb().Table(VERSION_TABLE)
 
 
-def _arg_parser() -> argparse.Namespace:
+def _arg_parser(argv: typing.Optional[typing.List[str]] = None) -> argparse.Namespace:
     """Parse the command line arguments.
 
     Parsed Arguments:
         upgrade: Upgrade the migration to the given version.
             version: The version to upgrade to.
+            --parallel: Run independent migrations concurrently.
         downgrade: Downgrade the migration by the given number of steps.
             number_of_steps: The number of steps to downgrade.
         revision: Create a new revision migration file.
             name: The name of the migration.
 
+    Args:
+        argv (typing.List[str], optional): The arguments to parse. Defaults to `sys.argv[1:]`.
+
     Returns:
         argparse.Namespace: The command line arguments.
     """
+    import argparse
+
     parser = argparse.ArgumentParser(description='Manage DynamoDB migrations')
     subparsers = parser.add_subparsers(dest='command')
 
     upgrade_parser = subparsers.add_parser('upgrade', help='Upgrade the migration')
     upgrade_parser.add_argument('version', nargs='?', default='head', help='The version to upgrade to')
+    upgrade_parser.add_argument(
+        '--parallel',
+        action='store_true',
+        help='Run independent migrations concurrently. If one fails, later migrations that already '
+             'finished are applied but not recorded, and are listed',
+    )
 
     downgrade_parser = subparsers.add_parser('downgrade', help='Downgrade the migration')
     downgrade_parser.add_argument('number_of_steps', nargs='?', default=1, type=int, help='The number of steps to downgrade')
@@ -70,144 +132,350 @@ def _arg_parser() -> argparse.Namespace:
     revision_parser = subparsers.add_parser('revision', help='Create a new revision migration file')
     revision_parser.add_argument('name', help='The name of the migration')
 
-    return parser.parse_args()
+    return parser.parse_args(argv)
+
+
+def _parse_args(argv: typing.List[str]) -> typing.Union[types.SimpleNamespace, argparse.Namespace]:
+    """Parse the command line arguments, only building the argparse parser when needed.
+
+    Well-formed commands are dispatched directly. Help flags, unknown commands and
+    malformed arguments fall back to `_arg_parser`, which prints the usage or error.
+
+    Args:
+        argv (typing.List[str]): The command line arguments, without the program name.
+
+    Returns:
+        typing.Union[types.SimpleNamespace, argparse.Namespace]: The command line arguments.
+    """
+    command, *args = argv or [None]
+    parallel = command == 'upgrade' and '--parallel' in args
+    positionals = [arg for arg in args if not (parallel and arg == '--parallel')]
+
+    if command == 'upgrade' and len(positionals) <= 1 and not any(arg.startswith('-') for arg in positionals):
+        version = positionals[0] if positionals else 'head'
+        return types.SimpleNamespace(command=command, version=version, parallel=parallel)
+    elif command == 'downgrade' and len(positionals) <= 1 and all(re.fullmatch(r'-?\d+', arg) for arg in positionals):
+        number_of_steps = int(positionals[0]) if positionals else 1
+        return types.SimpleNamespace(command=command, number_of_steps=number_of_steps)
+    elif command == 'revision' and len(positionals) == 1 and not positionals[0].startswith('-'):
+        return types.SimpleNamespace(command=command, name=positionals[0])
+
+    return _arg_parser(argv)
 
 
 def _create_version_table() -> None:
-    """Create a table in DynamoDB to store the version the migration is at.
+    """Create a table in DynamoDB to store the version the migration is at, if it doesn't exist.
 
     This table will have a single item with a single attribute, the version number.
+    Once the table is known to exist, later calls in the process return immediately.
     """
-    ddb.create_table(
-        TableName=VERSION_TABLE,
-        AttributeDefinitions=[
-            {
-                'AttributeName': 'id',
-                'AttributeType': 'N'
-            }
-        ],
-        KeySchema=[
-            {
-                'AttributeName': 'id',
-                'KeyType': 'HASH'
+    if _VERSION_TABLE_CACHE['exists']:
+        return
+
+    client = _ddb().meta.client
+    try:
+        client.describe_table(TableName=VERSION_TABLE)
+        _VERSION_TABLE_CACHE['exists'] = True
+        return
+    except client.exceptions.ResourceNotFoundException:
+        pass
+
+    try:
+        table = _ddb().create_table(
+            TableName=VERSION_TABLE,
+            AttributeDefinitions=[
+                {
+                    'AttributeName': 'id',
+                    'AttributeType': 'N'
+                }
+            ],
+            KeySchema=[
+                {
+                    'AttributeName': 'id',
+                    'KeyType': 'HASH'
+                }
+            ],
+            ProvisionedThroughput={
+                'ReadCapacityUnits': 1,
+                'WriteCapacityUnits': 1
             }
-        ],
-        ProvisionedThroughput={
-            'ReadCapacityUnits': 1,
-            'WriteCapacityUnits': 1
-        }
-    )
+        )
+        table.wait_until_exists()
+    except client.exceptions.ResourceInUseException:
+        # Created by another migration run since the describe_table call
+        pass
+
+    _VERSION_TABLE_CACHE['exists'] = True
 
 
-def _set_db_version(version: int) -> None:
+def _set_db_version(version: int, previous_version: int) -> None:
     """Set the version of the migration in the database.
 
+    The write is conditional on the stored version still being `previous_version`,
+    so two migration runs started from the same version cannot both advance it. It
+    also succeeds if the stored version is already `version`, so a request retried
+    by botocore after a lost response is not mistaken for a concurrent run.
+
     Args:
         version (int): The version to set.
-    """
-    table = ddb.Table(VERSION_TABLE)
+        previous_version (int): The version the database is expected to be at.
 
+    Raises:
+        ConditionalCheckFailedException: The stored version is neither `previous_version`
+            nor `version`.
+    """
     try:
-        table.update_item(
-            Key={'id': 1},
-            AttributeUpdates={
-                'version': version,
-            },
+        _version_table().put_item(
+            Item={'id': 1, 'version': version},
+            ConditionExpression=(
+                'attribute_not_exists(#version) OR #version = :previous_version OR #version = :version'
+            ),
+            ExpressionAttributeNames={'#version': 'version'},
+            ExpressionAttributeValues={':previous_version': previous_version, ':version': version},
         )
-    except Exception as e:
-        table.put_item(Item={'id': 1, 'version': version})
+    except _ddb().meta.client.exceptions.ConditionalCheckFailedException:
+        _DB_VERSION_CACHE['version'] = None
+        raise
+
+    _DB_VERSION_CACHE['version'] = version
 
 
 def _get_db_version() -> int:
     """Get the current version of the migration.
 
+    The version is cached after the first read and kept in sync by the writes
+    made in this process.
+
     Returns:
         int: The current version of the migration.
     """
-    table = ddb.Table(VERSION_TABLE)
-    response = table.scan()
-    items = response.get('Items')
-    return int(items[-1].get('version')) if items else 0
+    if _DB_VERSION_CACHE['version'] is None:
+        response = _version_table().get_item(Key={'id': 1})
+        item = response.get('Item')
+        _DB_VERSION_CACHE['version'] = int(item['version']) if item else 0
+
+    return _DB_VERSION_CACHE['version']
+
+
+def _get_migration_filenames() -> typing.List[typing.Tuple[int, str]]:
+    """Get the version numbers and filenames of the migrations in version order.
+
+    i.e. [(1, '1_initial_table.py'), (2, '2_add_new_table.py'), ...]
+
+    The result is cached until the modification time of the versions directory
+    changes, i.e. a migration file is added or removed.
+
+    Returns:
+        typing.List[typing.Tuple[int, str]]: The version numbers and filenames of the migrations.
+    """
+    mtime = os.stat(_VERSIONS_DIR_ABS).st_mtime_ns
+    if mtime == _MIGRATION_FILENAMES_CACHE['mtime']:
+        return _MIGRATION_FILENAMES_CACHE['filenames']
+
+    with os.scandir(_VERSIONS_DIR_ABS) as entries:
+        prefixed_entries = ((entry.name.partition('_')[0], entry) for entry in entries if entry.name.endswith('.py'))
+        migrations = sorted(
+            (int(version_number), entry.name)
+            for version_number, entry in prefixed_entries
+            if version_number.isdigit() and entry.is_file()
+        )
+
+    _MIGRATION_FILENAMES_CACHE['mtime'] = mtime
+    _MIGRATION_FILENAMES_CACHE['filenames'] = migrations
+    return migrations
+
+
+@functools.lru_cache(maxsize=1)
+def _read_version_template(mtime: int) -> str:
+    """Read the version template, cached until its modification time changes.
+
+    Args:
+        mtime (int): The modification time of the template, in nanoseconds.
+
+    Returns:
+        str: The contents of the version template.
+    """
+    with open(_VERSION_TEMPLATE_ABS, 'r') as f:
+        return f.read()
+
 
+def _load_migration(filename: str) -> types.ModuleType:
+    """Load a migration module directly from its file in the versions directory.
 
-def _get_migration_filenames() -> typing.List[str]:
-    """Get the filenames of the migrations in alphabetical order.
+    The module is loaded from its file path rather than imported through the
+    package, but is registered in `sys.modules` while it executes, as code such
+    as `dataclasses` and `typing.get_type_hints` looks its module up there.
 
-    i.e. ['1_initial_table.py', '2_add_new_table.py', ...]
+    Args:
+        filename (str): The filename of the migration.
 
     Returns:
-        typing.List[str]: The filenames of the migrations.
+        types.ModuleType: The loaded migration module.
     """
-    migrations = []
-    for filename in os.listdir(VERSIONS_DIR):
-        if filename.endswith('.py'):
-            migrations.append(filename)
+    module_name = filename[:-len('.py')]
+    spec = importlib.util.spec_from_file_location(
+        f'{VERSIONS_MODULE}.{module_name}',
+        os.path.join(_VERSIONS_DIR_ABS, filename),
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        sys.modules.pop(spec.name, None)
+        raise
 
-    return sorted(migrations)
+    return module
 
 
-def _migrate_to_version(version: int, is_upgrade: bool) -> None:
+def _migrate_to_version(version: int, is_upgrade: bool, parallel: bool = False) -> None:
     """Migrate to the given version.
 
     Args:
         version (int): The version to migrate to.
+        is_upgrade (bool): Whether to run the upgrade or downgrade of each migration.
+        parallel (bool, optional): Run the migrations concurrently. Only safe when the
+            migrations are independent of each other. If one fails, later migrations
+            that already finished stay applied without being recorded, and are
+            listed so they can be reverted or recorded by hand. Defaults to False.
     """
-    migration_filenames = _get_migration_filenames()
+    migrations = _get_migration_filenames()
+    migrations_by_version = dict(migrations)
     current_db_version = _get_db_version()
 
-    if not is_upgrade:
-        if version - 1 >= 0:
-            run_migrations = migration_filenames[current_db_version-1:version-1:-1]
-        else:
-            run_migrations = migration_filenames[current_db_version-1::-1]
+    if is_upgrade:
+        run_versions = range(current_db_version + 1, version + 1)
     else:
-        run_migrations = migration_filenames[current_db_version:version]
-
-    for filename in run_migrations:
-        print(f'{"Upgrade" if is_upgrade else "Downgrade"} file: ', filename)
+        run_versions = range(current_db_version, version, -1)
 
-        version_number = int(filename.split('_')[0])
-        module_name = filename.replace('.py', '')
-        module = __import__(f'{VERSIONS_MODULE}.{module_name}', fromlist=[module_name])
+    missing_versions = [str(v) for v in run_versions if v not in migrations_by_version]
+    if missing_versions:
+        print(f'Migration files not found for versions {", ".join(missing_versions)}')
+        return
 
-        if is_upgrade:
-            module.upgrade()
-            migrated_version = version_number
-        else:
-            module.downgrade()
-            migrated_version = version_number - 1
+    version_counts = collections.Counter(version_number for version_number, _ in migrations)
+    duplicate_filenames = [
+        filename
+        for version_number, filename in migrations
+        if version_number in run_versions and version_counts[version_number] > 1
+    ]
+    if duplicate_filenames:
+        print(f'Multiple migration files found for the same version: {", ".join(duplicate_filenames)}')
+        return
 
-        _set_db_version(migrated_version)
+    # Load every migration before touching the database so a broken file is
+    # reported up front instead of after some versions have been applied.
+    steps = []
+    invalid_migrations = []
+    for version_number in run_versions:
+        filename = migrations_by_version[version_number]
+        try:
+            module = _load_migration(filename)
+        except Exception as e:
+            invalid_migrations.append(f'{filename} ({type(e).__name__}: {e})')
+            continue
+
+        migrate = getattr(module, 'upgrade' if is_upgrade else 'downgrade', None)
+        if not callable(migrate):
+            invalid_migrations.append(f'{filename} (missing {"upgrade" if is_upgrade else "downgrade"} function)')
+            continue
+
+        steps.append((filename, migrate, version_number if is_upgrade else version_number - 1))
+
+    if invalid_migrations:
+        print('Invalid migration files:')
+        for invalid_migration in invalid_migrations:
+            print(f'    {invalid_migration}')
+        return
 
+    prefix = 'Upgrade file:' if is_upgrade else 'Downgrade file:'
 
-def upgrade(version: typing.Union[str, int]) -> None:
+    # Each step is checkpointed with a conditional write against the version
+    # tracked here, so a concurrent run is detected after at most one step.
+    try:
+        if not parallel:
+            for filename, migrate, migrated_version in steps:
+                print(prefix, filename)
+
+                migrate()
+
+                try:
+                    _set_db_version(migrated_version, previous_version=current_db_version)
+                except _ddb().meta.client.exceptions.ConditionalCheckFailedException:
+                    print(f'Migrations applied but not recorded - Recorded Version {current_db_version}:')
+                    print(f'    {filename}')
+                    raise
+
+                current_db_version = migrated_version
+            return
+
+        # Checkpoint in version order so a failure only records the migrations
+        # before it, and cancel the migrations that have not started yet.
+        futures = []
+        recorded_steps = 0
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_PARALLEL_MIGRATIONS) as executor:
+                futures = [executor.submit(migrate) for _, migrate, _ in steps]
+                try:
+                    for (filename, _, migrated_version), future in zip(steps, futures):
+                        future.result()
+                        print(prefix, filename)
+
+                        _set_db_version(migrated_version, previous_version=current_db_version)
+                        current_db_version = migrated_version
+                        recorded_steps += 1
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        except BaseException:
+            # Leaving the executor waited for the migrations already running, so any
+            # that succeeded after the failure have been applied without a checkpoint.
+            unrecorded_filenames = [
+                filename
+                for (filename, _, _), future in zip(steps[recorded_steps:], futures[recorded_steps:])
+                if not future.cancelled() and future.exception() is None
+            ]
+            if unrecorded_filenames:
+                print(f'Migrations applied but not recorded - Recorded Version {current_db_version}:')
+                for filename in unrecorded_filenames:
+                    print(f'    {filename}')
+            raise
+    except _ddb().meta.client.exceptions.ConditionalCheckFailedException:
+        print(f'Version was changed by another migration run - Expected Version {current_db_version}, aborting')
+
+
+def upgrade(version: typing.Union[str, int], parallel: bool = False) -> None:
     """Upgrade the migration to the given version.
     
     Args:
         version (str, optional): The version to upgrade to. Defaults to 'head'.
+        parallel (bool, optional): Run the migrations concurrently. Defaults to False.
     """
-    # Create the version table if it doesn't exist
-    try:
-        _create_version_table()
-    except Exception as e:
-        pass
+    _create_version_table()
 
     migrations = _get_migration_filenames()
     current_version = _get_db_version()
 
-    if version == 'head':
-        version = migrations[-1].split('_')[0]
-    elif not version.isdigit() or int(version) < 0:
-        print('Invalid version')
-        return
-    elif int(version) > len(migrations):
+    if not migrations:
         print('Version not found')
         return
-    elif int(version) <= int(current_version):
-        print(f'Version is already up to date - Current Version {current_version}')
+    elif version == 'head':
+        target_version = migrations[-1][0]
+    elif not version.isdigit():
+        print('Invalid version')
         return
+    else:
+        target_version = int(version)
+
+        if target_version > migrations[-1][0]:
+            print('Version not found')
+            return
+        elif target_version <= current_version:
+            print(f'Version is already up to date - Current Version {current_version}')
+            return
 
-    _migrate_to_version(int(version), is_upgrade=True)
+    _migrate_to_version(target_version, is_upgrade=True, parallel=parallel)
     
 
 def downgrade(number_of_steps: int) -> None:
@@ -217,7 +485,7 @@ def downgrade(number_of_steps: int) -> None:
         number_of_steps (int, optional): The number of steps to downgrade.
     """
     current_db_version = _get_db_version()
-    desired_version = int(current_db_version) - number_of_steps
+    desired_version = current_db_version - number_of_steps
 
     if number_of_steps < 0:
         print('Invalid number of steps')
@@ -235,16 +503,15 @@ def revision(name: str) -> None:
         name (str): The name of the migration.
     """
     migration_filenames = _get_migration_filenames()
-    version_head = int(migration_filenames[-1].split('_')[0])
+    version_head = migration_filenames[-1][0]
     new_version = version_head + 1
 
     snake_name = name.lower().replace(' ', '_')
     filename = f'{new_version}_{snake_name}.py'
     
-    with open(VERSION_TEMPLATE, 'r') as f:
-        template = f.read()
-    
-    with open(f'{VERSIONS_DIR}/{filename}', 'w') as f:
+    template = _read_version_template(os.stat(_VERSION_TEMPLATE_ABS).st_mtime_ns)
+
+    with open(os.path.join(_VERSIONS_DIR_ABS, filename), 'w') as f:
         f.write(template.replace('<revision_number>', str(new_version)).replace('<revision_description>', name))
 
     print(f'Successfully created migration file {filename}')
@@ -252,8 +519,8 @@ def revision(name: str) -> None:
 
 def create_versions_dir() -> None:
     """Setup the PynamoDB migration structure."""
-    if not os.path.exists(VERSIONS_DIR):
-        os.makedirs(VERSIONS_DIR)
+    if not os.path.exists(_VERSIONS_DIR_ABS):
+        os.makedirs(_VERSIONS_DIR_ABS)
 
         print('Successfully setup PynamoDB migration structure')
     else:
@@ -261,10 +528,10 @@ def create_versions_dir() -> None:
 
 
 if __name__ == '__main__':
-    args = _arg_parser()
+    args = _parse_args(sys.argv[1:])
 
     if args.command == 'upgrade':
-        upgrade(args.version)
+        upgrade(args.version, parallel=args.parallel)
     elif args.command == 'downgrade':
         downgrade(args.number_of_steps)
     elif args.command == 'revision':